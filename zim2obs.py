@@ -5,66 +5,136 @@ from pathlib import Path
 import shutil
 import datetime
 import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from tqdm import tqdm
 from PIL import Image
 
 
-def __compatible(lines):
+# patterns used by translate_line, compiled once at import instead of per line
+_RE_CT = re.compile(r"Content-Type: text/x-zim-wiki")
+_RE_WF = re.compile(r"Wiki-Format: zim 0\.[0-6]")
+_RE_TRAILING_NUM = re.compile(r"^(.*?)(\d+)(\..+)$")
+_RE_HEADING = re.compile(r"^(=+)\s*(.*?)\s*=+\s*$")
+_RE_DATE_ISO = re.compile(r"\[d:(\d{4}-\d{,2}-\d{,2})](.+)$")
+_RE_DATE_EU = re.compile(r"\[d:(\d{,2})\.(\d{,2})\.(\d{4})](.+)$")
+_RE_DATE_US = re.compile(r"\[d:(\d{,2})/(\d{,2})/(\d{4})](.+)$")
+_RE_DATE_SHORT = re.compile(r"\[d:(\d{,2}).(\d{,2}).\](.+)$")
+_RE_LINK_BRACKETED = re.compile(r"([\[]{2}(.+?\|?[^\]]+?)[\]]{2})")
+_RE_IMG_BRACKETED = re.compile(r"([\{]{2}(.+?\|?[^\]]+?)[\}]{2})")
+_RE_LIST = re.compile(r"^(\s*)\[([*x> ])\]")
+_RE_TAG_LEAD = re.compile(r"^@(\S+)")
+_RE_TAG_INLINE = re.compile(r"\s+@(\S+)")
+_RE_SUBPAGE = re.compile(r"\[\[\+(\S+?)\]\]")
+_RE_ITALIC = re.compile(r"//(.+?)//")
+_RE_SUBSCRIPT = re.compile(r"_\{(.+?)\}")
+_RE_SUPERSCRIPT = re.compile(r"\^\{(.+?)\}")
+_RE_STRIKE = re.compile(r"~~(.+?)~~")
+_RE_ITALIC_COLON = re.compile(r"(!?<=:)//([^:]+?)//")
+_RE_BOLD = re.compile(r"\*\*(.+?)\*\*")
+_RE_HIGHLIGHT = re.compile(r"__(.+?)__")
+_RE_HRULE = re.compile(r"--------------------")
+
+# per-file patterns used by translate_file
+_RE_TOPTITLE = re.compile(r"====== (.*) ======")
+_RE_CODE_LANG = re.compile(r'.+lang="(.+)" ')
+
+# one character of any of these is a necessary condition for any rule above
+# to match, so plain lines can skip the whole chain after a single scan
+_RE_ANY_MARKUP = re.compile(r"[=\[{@*/~^_-]")
+
+# single-pass backslash-to-forward-slash normalization
+_SLASHES = str.maketrans({"\\": "/"})
+
+
+def __compatible(first_line, second_line):
     """Return True iff the first two lines of a file allute to it being
     convertible or not."""
-    if len(lines) < 2:
-        return False
-    if not re.fullmatch(r"^Content-Type: text/x-zim-wiki$", lines[0].strip()):
-        return False
-    if not re.fullmatch(r"^Wiki-Format: zim 0\.[0-6]$", lines[1].strip()) is not None:
-        return False
-    return True
+    return (
+        _RE_CT.fullmatch(first_line.strip()) is not None
+        and _RE_WF.fullmatch(second_line.strip()) is not None
+    )
 
 
 def compatible(path=None, infile=None, lines=None):
-    """Return True iff the given path points to a Zim Wiki file."""
+    """Return True iff the given path points to a Zim Wiki file.
+
+    Only the first two lines are ever inspected, so file handles are read
+    line by line instead of slurping the whole file."""
     if path is not None:
-        with open(path, "r", encoding="utf-8") as _f:
-            return __compatible(_f.readlines()[:4])
+        # the two header lines fit comfortably in the first 256 bytes
+        with open(path, "rb") as _f:
+            header = _f.read(256).decode("utf-8", "replace").splitlines()
+        if len(header) < 2:
+            return False
+        return __compatible(header[0], header[1])
     elif infile is not None:
-        return __compatible(infile.readlines()[:4])
+        return __compatible(infile.readline(), infile.readline())
     elif lines is not None:
-        return __compatible(lines[:4])
+        if len(lines) < 2:
+            return False
+        return __compatible(lines[0], lines[1])
     return True
 
 
-def make_unique_string(existing_names: list[str], requested_name: str) -> str:
-    """Given a list of strings and a new string, returns a string that
-    does not already exist in the list by adding or incrementing
+def make_unique_string(existing_names: set[str], requested_name: str) -> str:
+    """Given a set of strings and a new string, returns a string that
+    does not already exist in the set by adding or incrementing
     a final number in the filename."""
-    proposed_filename = requested_name
-    while proposed_filename in existing_names:
-        final_digits = re.findall("(.*?)(\d+)(\..+)", proposed_filename)
-        if final_digits:
-            previous_digits = final_digits[0][1]
-            new_digits = str(int(previous_digits) + 1)
-            proposed_filename = "".join(
-                [
-                    final_digits[0][0],
-                    new_digits,
-                    final_digits[0][2],
-                ]
-            )
-        else:
-            fname, extension = os.path.splitext(proposed_filename)
-            proposed_filename = f"{fname} 1{extension}"
-    return proposed_filename
+    if requested_name not in existing_names:
+        return requested_name
+    m = _RE_TRAILING_NUM.match(requested_name)
+    if m:
+        stem, n, extension = m.group(1), int(m.group(2)), m.group(3)
+    else:
+        fname, extension = os.path.splitext(requested_name)
+        stem, n = f"{fname} ", 0
+    n += 1
+    while f"{stem}{n}{extension}" in existing_names:
+        n += 1
+    return f"{stem}{n}{extension}"
 
 
 def make_unique_filename(directory: Path, requested_filename: str) -> str:
     """Given a filename and directory, returns a valid filename that
     does not already exist in the directory by adding or incrementing
     a final number in the filename."""
-    dir_files = os.listdir(directory)
+    dir_files = set(os.listdir(directory))
     return make_unique_string(dir_files, requested_filename)
 
 
+# image dimensions keyed by resolved path, so repeat references to the same
+# image skip the PIL header parse
+_img_size_cache: dict[str, tuple[int, int]] = {}
+
+
+def _get_image_size(path: str) -> tuple[int, int]:
+    """Return (width, height) for an image, reading it at most once."""
+    size = _img_size_cache.get(path)
+    if size is None:
+        with Image.open(path) as img:
+            size = img.size
+        _img_size_cache[path] = size
+    return size
+
+
+def _scandir_walk(root):
+    """os.walk lookalike built on os.scandir that yields DirEntry objects,
+    reusing the file-type info returned by the directory read instead of
+    paying an extra stat per entry."""
+    dirs = []
+    files = []
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry)
+            else:
+                files.append(entry)
+    yield root, dirs, files
+    for d in dirs:
+        yield from _scandir_walk(d.path)
+
+
 def map_zim_dir_to_obsidian_dir(
     zim_dir: Path,
     obs_dir: Path,
@@ -74,63 +144,62 @@ def map_zim_dir_to_obsidian_dir(
     global_attachments_relative_path: Path = Path("attachments"),
 ):
     """Scans a zim-wiki directory and creates mappings for folders, note files, and other
-    files to an obsidian file structure."""
-    folder_map = {}
-    note_map = {}
-    file_map = {}
-
-    total_iterations = 0
-    for walkroot, folders, files in os.walk(zim_dir):
-        total_iterations += 1
-
+    files to an obsidian file structure.
+
+    The maps are keyed and valued by plain path strings; Path objects are
+    only materialized where a file is actually opened."""
+    folder_map: dict[str, str] = {}
+    folder_values: set[str] = set()
+    note_map: dict[str, str] = {}
+    file_map: dict[str, str] = {}
+    taken_names: set[str] = set()
+
+    zim_dir_s = os.fspath(zim_dir)
+    obs_dir_s = os.fspath(obs_dir)
+    attachments_dir_s = os.path.join(obs_dir_s, global_attachments_relative_path)
+
+    ignore_exts = frozenset(ignore_extensions)
+    walk_items = list(_scandir_walk(zim_dir))
     for walkroot, folders, files in tqdm(
-        os.walk(zim_dir),
+        walk_items,
         desc="Mapping zim directory",
-        total=total_iterations,
+        total=len(walk_items),
     ):
-        walkroot = Path(walkroot)
-        relroot = "" if walkroot == Path(zim_dir) else walkroot.relative_to(zim_dir)
+        walkroot = os.fspath(walkroot)
+        relroot = "" if walkroot == zim_dir_s else os.path.relpath(walkroot, zim_dir_s)
         for folder in folders:
-            c_folderpath_old = zim_dir.joinpath(relroot, folder)
-            c_folderpath_new = obs_dir.joinpath(relroot, folder)
-            folder_map[c_folderpath_old] = c_folderpath_new
+            c_folderpath_new = os.path.join(obs_dir_s, relroot, folder.name)
+            folder_map[folder.path] = c_folderpath_new
+            folder_values.add(c_folderpath_new)
         for file in files:
-            c_filepath_old = zim_dir.joinpath(relroot, file)
-            if os.path.splitext(file)[1] == ".txt" and compatible(c_filepath_old):
-                potential_folder_path = obs_dir.joinpath(
-                    relroot, os.path.splitext(file)[0]
-                )
-                if use_folder_notes and potential_folder_path in folder_map.values():
-                    # move inside folder with same name
-                    c_filepath_new = potential_folder_path.joinpath(file)
+            c_filepath_old = file.path
+            fname, ext = os.path.splitext(file.name)
+            if ext == ".txt" and compatible(c_filepath_old):
+                potential_folder_path = os.path.join(obs_dir_s, relroot, fname)
+                if use_folder_notes and potential_folder_path in folder_values:
+                    # move inside folder with same name, renamed to markdown
+                    c_filepath_new = os.path.join(potential_folder_path, fname + ".md")
                 else:
-                    c_filepath_new = obs_dir.joinpath(relroot, file)
-
-                # rename text to markdown
-                c_filepath_new = c_filepath_new.with_suffix(".md")
+                    c_filepath_new = os.path.join(obs_dir_s, relroot, fname + ".md")
 
                 note_map[c_filepath_old] = c_filepath_new
             else:
-                if os.path.splitext(file)[1] in ignore_extensions:
+                if ext in ignore_exts:
                     continue
                 if use_global_attachments:
-                    proposed_name = obs_dir.joinpath(
-                        global_attachments_relative_path, file
-                    )
-                    unique_filename = Path(
-                        make_unique_string(
-                            [str(s) for s in file_map.values()], str(proposed_name)
-                        )
-                    )
+                    proposed_name = os.path.join(attachments_dir_s, file.name)
+                    unique_filename = make_unique_string(taken_names, proposed_name)
+                    taken_names.add(unique_filename)
                     file_map[c_filepath_old] = unique_filename
                 else:
-                    c_filepath_new = obs_dir.joinpath(relroot, file)
-                    file_map[c_filepath_old] = c_filepath_new
+                    file_map[c_filepath_old] = os.path.join(
+                        obs_dir_s, relroot, file.name
+                    )
 
     return folder_map, note_map, file_map
 
 
-def zim_filepath_to_title(filepath: Path) -> str:
+def zim_filepath_to_title(filepath: str) -> str:
     """Given a filepath to a zim .txt, get the title of the page
 
     Ex.
@@ -141,7 +210,7 @@ def zim_filepath_to_title(filepath: Path) -> str:
     return os.path.splitext(os.path.basename(filepath))[0].replace("_", " ")
 
 
-def zim_filepath_to_titlepath(filepath: Path, zim_dir: Path) -> str:
+def zim_filepath_to_titlepath(filepath: str, zim_dir: str) -> str:
     """Given a filepath to a zim.txt and notebook directory, get the relative
     title to the page.
 
@@ -157,63 +226,76 @@ def zim_filepath_to_titlepath(filepath: Path, zim_dir: Path) -> str:
 def translate_file(
     zim_dir: Path,
     obs_dir: Path,
-    old_filepath: Path,
-    note_map: dict[Path, Path],
-    file_map: dict[Path, Path],
+    old_filepath: str,
+    note_map: dict[str, str],
+    file_map: dict[str, str],
     use_folder_notes: bool,
     use_global_attachments: bool,
     global_attachments_relative_path: Path,
 ) -> list[str]:
     """Translate a zim file into an Obsidian note."""
 
-    with open(old_filepath, "r", encoding="utf-8") as _f:
-        lines = _f.readlines()
+    with open(old_filepath, "rb") as _f:
+        # notes are read front to back, so tell the kernel to read ahead
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(_f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        data = _f.read()
+    # decode, normalize CRLF like text mode did, and split, each in one
+    # C-level pass instead of line by line
+    lines = data.decode("utf-8").replace("\r\n", "\n").splitlines(keepends=True)
 
     # remove file format headers
     lines = lines[4:]
 
     # ignore duplicate title text
     title = zim_filepath_to_title(old_filepath)
-    topline = re.findall("====== (.*) ======", lines[0])
-    if topline and topline[0].replace("_", " ") == title:
+    m = _RE_TOPTITLE.match(lines[0] if lines else "")
+    if m and m.group(1).replace("_", " ") == title:
         lines = lines[1:]
 
-    i = -1
-    while i < len(lines) - 1:
-        i += 1
-        line = lines[i]
+    # file-invariant values used by every line, kept as plain strings so
+    # the per-line lookups never rebuild Path objects
+    zim_dir_s = os.fspath(zim_dir)
+    obs_dir_s = os.fspath(obs_dir)
+    page_path = zim_filepath_to_titlepath(old_filepath, zim_dir_s)
+    attachment_dir = os.path.join(obs_dir_s, global_attachments_relative_path)
+
+    n = len(lines)
+    skip_until = -1
+    for i, line in enumerate(lines):
+        if i <= skip_until:
+            continue
 
         if line.startswith("{{{code:"):
             # code blocks
-            langtag = re.findall('.+lang="(.+)" ', line)
+            langtag = _RE_CODE_LANG.match(line)
             if langtag:
-                lang = langtag[0]
+                lang = langtag.group(1)
                 if lang == "python3":
                     lang = "python"
             else:
                 lang = ""
             lines[i] = f"```{lang}\n"
-            j = 0
-            subline = lines[i + j]
-            while not subline.startswith("}}}"):
-                j += 1
-                subline = lines[i + j]
-            lines[i + j] = "```\n"
-            i += j + 1
-            continue
+            end = next(
+                (k for k in range(i + 1, n) if lines[k].startswith("}}}")), n - 1
+            )
+            lines[end] = "```\n"
+            skip_until = end
         else:
             # general line translation
             try:
                 line = translate_line(
                     line,
-                    zim_dir,
-                    obs_dir,
+                    zim_dir_s,
+                    obs_dir_s,
                     old_filepath,
+                    title,
+                    page_path,
                     note_map,
                     file_map,
                     use_folder_notes,
                     use_global_attachments,
-                    global_attachments_relative_path,
+                    attachment_dir,
                 )
             except Exception as e:
                 print(f"Error in file: `{old_filepath}` in line: `{line}`")
@@ -225,51 +307,42 @@ def translate_file(
 
 def translate_line(
     line: str,
-    zim_dir: Path,
-    obs_dir: Path,
-    old_filepath: Path,
-    note_map: dict[Path, Path],
-    file_map: dict[Path, Path],
+    zim_dir: str,
+    obs_dir: str,
+    old_filepath: str,
+    title: str,
+    page_path: str,
+    note_map: dict[str, str],
+    file_map: dict[str, str],
     use_folder_notes: bool,
     use_global_attachments: bool,
-    global_attachments_relative_path: Path,
+    attachment_dir: str,
 ) -> str:
 
-    title = zim_filepath_to_title(old_filepath)
+    # plain prose needs no translation
+    if not _RE_ANY_MARKUP.search(line):
+        return line
 
-    # Headings
-    line = re.sub(r"^(=+)([^=]+)=+$", r"\g<1>\g<2>", line)  # removes tailing '='
-    line = re.sub(r"^======", "#", line)
-    line = re.sub(r"^=====", "##", line)
-    line = re.sub(r"^====", "###", line)
-    line = re.sub(r"^===", "####", line)
-    line = re.sub(r"^==", "#####", line)
-    line = re.sub(r"^=", "######", line)
+    # Headings: '====== text ======' down to '= text =' map to '#'..'######'
+    m = _RE_HEADING.match(line)
+    if m:
+        line = "#" * (7 - min(6, len(m.group(1)))) + " " + m.group(2) + "\n"
 
     # Dates
-    line = re.sub(
-        r"\[d:(\d{4}-\d{,2}-\d{,2})](.+)$", r"\g<2>\nDEADLINE: <\g<1> Day>", line
-    )
-    line = re.sub(
-        r"\[d:(\d{,2})\.(\d{,2})\.(\d{4})](.+)$",
-        r"\g<4>\nDEADLINE: <\g<3>-\g<2>-\g<1> Day>",
-        line,
+    line = _RE_DATE_ISO.sub(r"\g<2>\nDEADLINE: <\g<1> Day>", line)
+    line = _RE_DATE_EU.sub(
+        r"\g<4>\nDEADLINE: <\g<3>-\g<2>-\g<1> Day>", line
     )  # central European date format!
-    line = re.sub(
-        r"\[d:(\d{,2})/(\d{,2})/(\d{4})](.+)$",
-        r"\g<4>\nDEADLINE: <\g<3>-\g<1>-\g<2> Day>",
-        line,
+    line = _RE_DATE_US.sub(
+        r"\g<4>\nDEADLINE: <\g<3>-\g<1>-\g<2> Day>", line
     )  # American dates!
-    line = re.sub(
-        r"\[d:(\d{,2}).(\d{,2}).\](.+)$",
+    line = _RE_DATE_SHORT.sub(
         r"\g<3>\nDEADLINE: <" + str(datetime.date.today().year) + r"-\g<2>-\g<1> Day>",
         line,
     )
 
     # Hyperlink text [[ ]]
-    for bracketed_link, internal in re.findall(
-        r"([\[]{2}(.+?\|?[^\]]+?)[\]]{2})", line
-    ):
+    for bracketed_link, internal in _RE_LINK_BRACKETED.findall(line):
         target = ""
         absolute = False
         # stars with nothing, or [[file:///]] or [[+]] or [[:]] or [[wp?]] or [[./]] or [[.\\]]
@@ -285,8 +358,6 @@ def translate_line(
                 " ", "_"
             )
 
-        page_path = zim_filepath_to_titlepath(old_filepath, zim_dir)
-
         if target.startswith("http"):
             pass
         elif target.startswith("file:///"):
@@ -304,14 +375,12 @@ def translate_line(
             if display.startswith("./") or display.startswith(".\\"):
                 display = display[2:]
             absolute = False
-            zim_abs_path = zim_dir.joinpath(page_path, target)
+            zim_abs_path = os.path.join(zim_dir, page_path, target)
             obs_abs_path = file_map[zim_abs_path]
             if use_global_attachments:
-                attachment_dir = obs_dir.joinpath(global_attachments_relative_path)
-                obs_rel_path = obs_abs_path.relative_to(attachment_dir)
+                target = os.path.relpath(obs_abs_path, attachment_dir)
             else:
-                obs_rel_path = obs_abs_path.relative_to(obs_dir)
-            target = str(obs_rel_path)
+                target = os.path.relpath(obs_abs_path, obs_dir)
         else:
             # modify relative links
             # TODO found one edge case where linking to [[b]] with multiple b pages chose the wrong one,
@@ -324,17 +393,17 @@ def translate_line(
             target = target.replace(":", "\\")
 
         # if using folder notes, point in one level to the page
-        if use_folder_notes and zim_dir.joinpath(target).is_dir():
+        if use_folder_notes and os.path.isdir(os.path.join(zim_dir, target)):
             target = os.path.join(target, os.path.split(target)[-1])
         
         # check for underscore weirdness
-        if zim_dir.joinpath(target).with_suffix(".txt") not in note_map:
+        if os.path.join(zim_dir, target) + ".txt" not in note_map:
             under_target = target.replace(" ", "_")
-            if zim_dir.joinpath(under_target).with_suffix(".txt") in note_map:
+            if os.path.join(zim_dir, under_target) + ".txt" in note_map:
                 target = under_target
 
         # replace backslash with forward slash for obsidian links
-        target = target.replace("\\", "/")
+        target = target.translate(_SLASHES)
 
         # replace link structure
         # Valid link formats:
@@ -350,9 +419,7 @@ def translate_line(
             line = line.replace(bracketed_link, f"[[{target}]]", 1)
 
     # File object links (usually images) {{ }}
-    for bracketed_link, internal in re.findall(
-        r"([\{]{2}(.+?\|?[^\]]+?)[\}]{2})", line
-    ):
+    for bracketed_link, internal in _RE_IMG_BRACKETED.findall(line):
         target = ""
         absolute = False
         # starts with {{file:///}} or {{./}} or {{.\\}}
@@ -363,8 +430,6 @@ def translate_line(
         else:
             target = internal
 
-        page_path = zim_filepath_to_titlepath(old_filepath, zim_dir)
-
         if target.startswith("file:///"):
             # TODO when absolute references exist obsidian randomly enters newlines?
             # maybe copy file into folder and link to that instead?
@@ -378,32 +443,28 @@ def translate_line(
                 )
             except ValueError:
                 # not a related path, use as absolute
-                zim_abs_path = Path(target)
+                zim_abs_path = target
                 absolute = True
 
         if target.startswith(".\\") or target.startswith("./"):
             absolute = False
             target = target[2:]
 
-            local_folder = old_filepath.relative_to(zim_dir).with_suffix("")
-            zim_abs_path = zim_dir.joinpath(local_folder, target)
+            local_folder = os.path.splitext(os.path.relpath(old_filepath, zim_dir))[0]
+            zim_abs_path = os.path.join(zim_dir, local_folder, target)
             obs_abs_path = file_map[zim_abs_path]
 
             if use_global_attachments:
-                attachment_dir = obs_dir.joinpath(global_attachments_relative_path)
-                obs_rel_path = obs_abs_path.relative_to(attachment_dir)
+                target = os.path.relpath(obs_abs_path, attachment_dir)
             else:
-                obs_rel_path = obs_abs_path.relative_to(obs_dir)
-
-            target = str(obs_rel_path)
+                target = os.path.relpath(obs_abs_path, obs_dir)
 
         if options:
             options_dict = dict([x.split("=") for x in options.split("&")])
             for key, value in options_dict.items():
                 if key in ["height", "width"]:
                     try:
-                        with Image.open(zim_abs_path) as img:
-                            width, height = img.size
+                        width, height = _get_image_size(zim_abs_path)
                         if key == "height":
                             x_height = int(options_dict["height"])
                             x_width = int(int(options_dict["height"]) / height * width)
@@ -424,30 +485,27 @@ def translate_line(
             line = line.replace(bracketed_link, f"![[{target}]]", 1)
 
     # Lists
-    line = re.sub(r"^(\s*)\[\*\]", r"\g<1>- [*]", line, count=1)
-    line = re.sub(r"^(\s*)\[x\]", r"\g<1>- [x]", line, count=1)
-    line = re.sub(r"^(\s*)\[>\]", r"\g<1>- [>]", line, count=1)
-    line = re.sub(r"^(\s*)\[ \]", r"\g<1>- [ ]", line, count=1)
+    line = _RE_LIST.sub(lambda m: f"{m.group(1)}- [{m.group(2)}]", line, count=1)
     # TODO indented list elements without dots or checkboxes
 
     # @tags and +SubPageReferences
-    line = re.sub(r"^@(\S+)", r"#\g<1>", line)
-    line = re.sub(r"\s+@(\S+)", r"#\g<1>", line)
-    line = re.sub(r"\[\[\+(\S+?)\]\]", r"[[\g<1>]]", line)
+    line = _RE_TAG_LEAD.sub(r"#\g<1>", line)
+    line = _RE_TAG_INLINE.sub(r"#\g<1>", line)
+    line = _RE_SUBPAGE.sub(r"[[\g<1>]]", line)
 
     # italics
-    line = re.sub(r"//(.+?)//", r"*\g<1>*", line)
+    line = _RE_ITALIC.sub(r"*\g<1>*", line)
 
     # rich text formatting?
-    line = re.sub(r"_\{(.+?)\}", r"<sub>\g<1></sub>", line)
-    line = re.sub(r"\^\{(.+?)\}", r"<sup>\g<1></sup>", line)
-    line = re.sub(r"~~(.+?)~~", r"~~\g<1>~~", line)
-    line = re.sub(r"(!?<=:)//([^:]+?)//", r"*\g<1>*", line)
-    line = re.sub(r"\*\*(.+?)\*\*", r"**\g<1>**", line)
-    line = re.sub(r"__(.+?)__", r"==\g<1>==", line)
+    line = _RE_SUBSCRIPT.sub(r"<sub>\g<1></sub>", line)
+    line = _RE_SUPERSCRIPT.sub(r"<sup>\g<1></sup>", line)
+    line = _RE_STRIKE.sub(r"~~\g<1>~~", line)
+    line = _RE_ITALIC_COLON.sub(r"*\g<1>*", line)
+    line = _RE_BOLD.sub(r"**\g<1>**", line)
+    line = _RE_HIGHLIGHT.sub(r"==\g<1>==", line)
 
     # horizontal line
-    line = re.sub(r"--------------------", r"\n---", line)
+    line = _RE_HRULE.sub(r"\n---", line)
 
     # footnotes, unused and messes with links like `![](C:/Users/Mirro/Downloads/5096196.png|300x300)`
     # line = re.sub(r"(?!<=\[)\[([0-9]{,4})\](?!=\])", r"[^\g<1>]", line)
@@ -467,12 +525,61 @@ def translate_line(
     return line
 
 
+def _translate_one(args):
+    """Worker for the note-translation pool: read, translate, and write one
+    note. Takes a single tuple so it can be fed to Executor.map."""
+    (
+        old_filepath,
+        new_filepath,
+        zim_dir,
+        obs_dir,
+        note_map,
+        file_map,
+        use_folder_notes,
+        use_global_attachments,
+        global_attachments_relative_path,
+    ) = args
+
+    new_content = translate_file(
+        zim_dir,
+        obs_dir,
+        old_filepath,
+        note_map,
+        file_map,
+        use_folder_notes,
+        use_global_attachments,
+        global_attachments_relative_path,
+    )
+
+    with open(new_filepath, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.writelines(new_content)
+
+
+def _dump_map(filename: str, mapping: dict[str, str], zim_s: str, obs_s: str):
+    """Write a debug map as JSON entry by entry, shortening the zim/obsidian
+    roots to ℤ/𝕆, without materializing a transformed copy of the map."""
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("{")
+        sep = "\n  "
+        for k, v in mapping.items():
+            key = json.dumps(
+                k.translate(_SLASHES).replace(zim_s, "ℤ"), ensure_ascii=False
+            )
+            value = json.dumps(
+                v.translate(_SLASHES).replace(obs_s, "𝕆"), ensure_ascii=False
+            )
+            f.write(f"{sep}{key}: {value}")
+            sep = ",\n  "
+        f.write("\n}")
+
+
 def migrate_zim_to_obsidian(
     zim_dir: Path,
     obs_dir: Path,
     use_folder_notes: bool,
     use_global_attachments: bool,
     global_attachments_relative_path: Path = Path("attachments"),
+    debug: bool = False,
 ):
 
     # scan folder and make maps of file changes
@@ -484,40 +591,67 @@ def migrate_zim_to_obsidian(
         global_attachments_relative_path=global_attachments_relative_path,
     )
 
-    with open('folder_map.json', 'w', encoding="utf-8") as f:
-        json.dump({str(k).replace("\\", "/").replace(str(zim_dir).replace("\\", "/"), "ℤ"): str(v).replace("\\", "/").replace(str(obs_dir).replace("\\", "/"), "𝕆") for k, v in folder_map.items()}, f, indent=2, ensure_ascii=False)
-    with open('note_map.json', 'w', encoding="utf-8") as f:
-        json.dump({str(k).replace("\\", "/").replace(str(zim_dir).replace("\\", "/"), "ℤ"): str(v).replace("\\", "/").replace(str(obs_dir).replace("\\", "/"), "𝕆") for k, v in note_map.items()}, f, indent=2, ensure_ascii=False)
-    with open('file_map.json', 'w', encoding="utf-8") as f:
-        json.dump({str(k).replace("\\", "/").replace(str(zim_dir).replace("\\", "/"), "ℤ"): str(v).replace("\\", "/").replace(str(obs_dir).replace("\\", "/"), "𝕆") for k, v in file_map.items()}, f, indent=2, ensure_ascii=False)
-
-    # re-create folder structure
-    for old_folder, new_folder in tqdm(folder_map.items(), desc="Creating folder structure"):
-        if not os.path.exists(new_folder):
-            os.makedirs(new_folder, exist_ok=True)
+    if debug:
+        zim_s = str(zim_dir).translate(_SLASHES)
+        obs_s = str(obs_dir).translate(_SLASHES)
+        _dump_map("folder_map.json", folder_map, zim_s, obs_s)
+        _dump_map("note_map.json", note_map, zim_s, obs_s)
+        _dump_map("file_map.json", file_map, zim_s, obs_s)
+
+    # re-create folder structure, deepest first so each makedirs call covers
+    # its ancestors and they never get their own mkdir syscall
+    created: set[str] = set()
+    for new_folder in tqdm(
+        sorted(folder_map.values(), key=len, reverse=True),
+        desc="Creating folder structure",
+    ):
+        if new_folder in created:
+            continue
+        os.makedirs(new_folder, exist_ok=True)
+        created.add(new_folder)
+        parent = os.path.dirname(new_folder)
+        while parent and parent not in created:
+            created.add(parent)
+            parent = os.path.dirname(parent)
 
     # move non-note files
     if use_global_attachments:
         os.makedirs(obs_dir.joinpath(global_attachments_relative_path), exist_ok=True)
-    for old_filepath, new_filepath in tqdm(file_map.items(), desc="Copying non-note files"):
-        shutil.copy(old_filepath, new_filepath)
-
-    # translate and move note files
-    for old_filepath, new_filepath in tqdm(note_map.items(), desc="Translating and moving notes"):
+    if file_map:
+        # copies are I/O wait, so threads let the OS overlap reads and writes
+        with ThreadPoolExecutor(max_workers=min(32, len(file_map))) as ex:
+            list(
+                tqdm(
+                    ex.map(lambda kv: shutil.copy(*kv), file_map.items()),
+                    desc="Copying non-note files",
+                    total=len(file_map),
+                )
+            )
 
-        new_content = translate_file(
+    # translate and move note files, one process per core
+    tasks = [
+        (
+            old_filepath,
+            new_filepath,
             zim_dir,
             obs_dir,
-            old_filepath,
             note_map,
             file_map,
             use_folder_notes,
             use_global_attachments,
             global_attachments_relative_path,
         )
-
-        with open(new_filepath, "w", encoding="utf-8") as f:
-            f.write("".join(new_content))
+        for old_filepath, new_filepath in note_map.items()
+    ]
+    if tasks:
+        with ProcessPoolExecutor() as ex:
+            list(
+                tqdm(
+                    ex.map(_translate_one, tasks, chunksize=16),
+                    desc="Translating and moving notes",
+                    total=len(tasks),
+                )
+            )
 
     return folder_map, note_map, file_map
 
@@ -538,48 +672,24 @@ def test_aaatest():
     )
 
     # folders
-    assert folder_map[Path(f"{zim_dir}\\Bumblebee")] == Path(f"{obs_dir}\\Bumblebee")
-    assert folder_map[Path(f"{zim_dir}\\capybara")] == Path(f"{obs_dir}\\capybara")
-    assert folder_map[Path(f"{zim_dir}\\Bumblebee\\Buzzy")] == Path(
-        f"{obs_dir}\\Bumblebee\\Buzzy"
-    )
-    assert folder_map[Path(f"{zim_dir}\\Bumblebee\\honey")] == Path(
-        f"{obs_dir}\\Bumblebee\\honey"
-    )
+    assert folder_map[f"{zim_dir}\\Bumblebee"] == f"{obs_dir}\\Bumblebee"
+    assert folder_map[f"{zim_dir}\\capybara"] == f"{obs_dir}\\capybara"
+    assert folder_map[f"{zim_dir}\\Bumblebee\\Buzzy"] == f"{obs_dir}\\Bumblebee\\Buzzy"
+    assert folder_map[f"{zim_dir}\\Bumblebee\\honey"] == f"{obs_dir}\\Bumblebee\\honey"
 
     # note files
-    assert note_map[Path(f"{zim_dir}\\armadillo.txt")] == Path(
-        f"{obs_dir}\\armadillo.md"
-    )
-    assert note_map[Path(f"{zim_dir}\\Bumblebee.txt")] == Path(
-        f"{obs_dir}\\Bumblebee\\Bumblebee.md"
-    )
-    assert note_map[Path(f"{zim_dir}\\capybara.txt")] == Path(
-        f"{obs_dir}\\capybara\\capybara.md"
-    )
-    assert note_map[Path(f"{zim_dir}\\Bumblebee\\Buzzy.txt")] == Path(
-        f"{obs_dir}\\Bumblebee\\Buzzy\\Buzzy.md"
-    )
-    assert note_map[Path(f"{zim_dir}\\Bumblebee\\honey.txt")] == Path(
-        f"{obs_dir}\\Bumblebee\\honey\\honey.md"
-    )
-    assert note_map[Path(f"{zim_dir}\\capybara\\honey.txt")] == Path(
-        f"{obs_dir}\\capybara\\honey.md"
-    )
+    assert note_map[f"{zim_dir}\\armadillo.txt"] == f"{obs_dir}\\armadillo.md"
+    assert note_map[f"{zim_dir}\\Bumblebee.txt"] == f"{obs_dir}\\Bumblebee\\Bumblebee.md"
+    assert note_map[f"{zim_dir}\\capybara.txt"] == f"{obs_dir}\\capybara\\capybara.md"
+    assert note_map[f"{zim_dir}\\Bumblebee\\Buzzy.txt"] == f"{obs_dir}\\Bumblebee\\Buzzy\\Buzzy.md"
+    assert note_map[f"{zim_dir}\\Bumblebee\\honey.txt"] == f"{obs_dir}\\Bumblebee\\honey\\honey.md"
+    assert note_map[f"{zim_dir}\\capybara\\honey.txt"] == f"{obs_dir}\\capybara\\honey.md"
 
     # other files
-    assert file_map[Path(f"{zim_dir}\\Bumblebee\\Buzzy\\pasted_image.png")] == Path(
-        f"{obs_dir}\\attachments\\pasted_image.png"
-    )
-    assert file_map[Path(f"{zim_dir}\\Bumblebee\\honey\\pasted_image.png")] == Path(
-        f"{obs_dir}\\attachments\\pasted_image 1.png"
-    )
-    assert file_map[Path(f"{zim_dir}\\capybara\\pasted_image.png")] == Path(
-        f"{obs_dir}\\attachments\\pasted_image 2.png"
-    )
-    assert file_map[Path(f"{zim_dir}\\capybara\\139-item-catch.mp3")] == Path(
-        f"{obs_dir}\\attachments\\139-item-catch.mp3"
-    )
+    assert file_map[f"{zim_dir}\\Bumblebee\\Buzzy\\pasted_image.png"] == f"{obs_dir}\\attachments\\pasted_image.png"
+    assert file_map[f"{zim_dir}\\Bumblebee\\honey\\pasted_image.png"] == f"{obs_dir}\\attachments\\pasted_image 1.png"
+    assert file_map[f"{zim_dir}\\capybara\\pasted_image.png"] == f"{obs_dir}\\attachments\\pasted_image 2.png"
+    assert file_map[f"{zim_dir}\\capybara\\139-item-catch.mp3"] == f"{obs_dir}\\attachments\\139-item-catch.mp3"
 
 
 if __name__ == "__main__":
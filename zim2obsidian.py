@@ -9,22 +9,78 @@ Usage:
 
 USE_FOLDER_NOTES = True
 
+# temp google drive workaround: extensions that are neither converted nor copied
+SKIP_EXTS = frozenset({".gform", ".gsheet"})
+
 import os
-from re import sub, fullmatch, findall
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from shutil import copy2
+from shutil import copyfile
 from datetime import datetime
 from typing import List
 import sys
 
+# patterns used by translate, compiled once at import instead of per line
+_RE_HEADING = re.compile(r"^(=+)([^=]+)=+$")
+_RE_DATE_ISO = re.compile(r"\[d:(\d{4}-\d{,2}-\d{,2})](.+)$")
+_RE_DATE_EU = re.compile(r"\[d:(\d{,2})\.(\d{,2})\.(\d{4})](.+)$")
+_RE_DATE_US = re.compile(r"\[d:(\d{,2})/(\d{,2})/(\d{4})](.+)$")
+_RE_DATE_SHORT = re.compile(r"\[d:(\d{,2}).(\d{,2}).\](.+)$")
+_RE_LINK = re.compile(r"\[\[.+?\|?[^\]]+?\]\]")
+_RE_FILEURL = re.compile(r"(file://\S+)")
+# checkbox markers at the start of a (possibly indented) line
+_CHECKBOX_MARKS = {"[*]": "- [*]", "[x]": "- [x]", "[>]": "- [>]", "[ ]": "- [ ]"}
+_RE_TAG_INLINE = re.compile(r"\s+@(\S+)")
+_RE_ITALIC_COLON = re.compile(r"(!?<=:)//([^:]+?)//")
+_RE_FOOTNOTE = re.compile(r"(?!<=\[)\[([0-9]{,4})\](?!=\])")
+_RE_IMG_PARAM_FWD = re.compile(r"{{\./(.+?)(?:\?.+)}}")
+_RE_IMG_PARAM_BACK = re.compile(r"{{\.\\(.+?)(?:\?.+)}}")
+_RE_IMG_FWD = re.compile(r"{{\./(.+?)}}")
+_RE_IMG_BACK = re.compile(r"{{\.\\(.+?)}}")
+_RE_TOPTITLE = re.compile(r"====== (.*) ======")
+_RE_CODE_LANG = re.compile(r'.+lang="(.+)" ')
+# a whole code block in one match: opening '{{{code:' line, verbatim body,
+# closing '}}}' line
+_RE_CODEBLOCK = re.compile(
+    r"^\{\{\{code:(?P<meta>[^\n]*)\n(?P<body>.*?)^\}\}\}[^\n]*\n?",
+    re.DOTALL | re.MULTILINE,
+)
+
+# inline rich-text rules fused into one alternation so each line is scanned
+# once instead of once per rule; the leftmost alternative wins
+_RE_RICH = re.compile(
+    r"//(?P<italic>.+?)//"
+    r"|_\{(?P<subscript>.+?)\}"
+    r"|\^\{(?P<superscript>.+?)\}"
+    r"|~~(?P<strike>.+?)~~"
+    r"|\*\*(?P<bold>.+?)\*\*"
+    r"|__(?P<highlight>.+?)__"
+)
+_RICH_HANDLERS = {
+    "italic": lambda s: f"*{s}*",
+    "subscript": lambda s: f"<sub>{s}</sub>",
+    "superscript": lambda s: f"<sup>{s}</sup>",
+    "strike": lambda s: f"~~{s}~~",
+    "bold": lambda s: f"**{s}**",
+    "highlight": lambda s: f"=={s}==",
+}
+
+def _rich_repl(match):
+    """Dispatch a fused rich-text match to its handler, recursing into the
+    matched span so nested markup still converts."""
+    name = match.lastgroup
+    inner = _RE_RICH.sub(_rich_repl, match.group(name))
+    return _RICH_HANDLERS[name](inner)
+
 def __compatible(lines):
     """Return True iff the first two lines of a file allute to it being
     convertible or not."""
     if len(lines) < 2:
         return False
-    if not fullmatch(r"^Content-Type: text/x-zim-wiki$", lines[0].strip()):
+    if not re.fullmatch(r"^Content-Type: text/x-zim-wiki$", lines[0].strip()):
         return False
-    if not fullmatch(r"^Wiki-Format: zim 0\.[0-6]$", lines[1].strip()) is not None:
+    if not re.fullmatch(r"^Wiki-Format: zim 0\.[0-6]$", lines[1].strip()) is not None:
         return False
     return True
 
@@ -32,8 +88,11 @@ def __compatible(lines):
 def compatible(path=None, infile=None, lines=None):
     """Return True iff the given path points to a Zim Wiki file."""
     if path is not None:
-        with open(path, "r") as _f:
-            return __compatible(_f.readlines()[:4])
+        # the header lines sit at the very top; 256 bytes cover them, no
+        # need to read the whole file
+        with open(path, "rb") as _f:
+            head = _f.read(256)
+        return __compatible(head.decode("utf-8", "replace").splitlines())
     elif infile is not None:
         return __compatible(infile.readlines()[:4])
     elif lines is not None:
@@ -42,158 +101,203 @@ def compatible(path=None, infile=None, lines=None):
 
 # TODO make test file that has everything
 
-def translate(text: List[str], path:str="", nbpath:str="") -> List[str]:
-    """Discards the first four lines. All other lines are converted."""
+def translate(text: str, path:str="", nbpath:str="") -> str:
+    """Discards the first four lines. All other lines are converted and
+    returned as a single Markdown string."""
     # The first 4 lines usually contain file format info.
-    text = text[4:]
+    lines = text.splitlines(keepends=True)[4:]
     headline_nr = 0
     current_ind = 0
     title = os.path.splitext(os.path.basename(path))[0].replace("_", " ")
     relpath = "/".join(str(os.path.relpath(path, nbpath)).split(os.sep)[:-1])
+    # per-document constants, computed once instead of per link
+    home_uri = Path.home().as_uri()
+    subpage_prefix = f"{title}/"
+    img_repl = rf"![[{title}/\g<1>]]"
+    year = str(datetime.now().year)
+    rich_sub = _RE_RICH.sub
+
+    def _link_repl(m):
+        """Rewrite one [[...]] link; used as a sub() callback so each line
+        is scanned once instead of findall plus one str.replace per link."""
+        body = m.group(0)[2:-2]
+        if body.startswith(":"):
+            # absolute page reference; what the separate [[:...]] pass did
+            body = body.replace(":", "/")
+        tokens = body.split("|")
+
+        if len(tokens) > 2:
+            # probably not a link.
+            return m.group(0)
+
+        if len(tokens) == 2:
+            target, label = tokens
+        else:
+            label = tokens[0]
+            target = tokens[0]
 
-    # ignore duplicate title text
-    topline = findall("====== (.*) ======", text[0])
-    if topline and topline[0].replace("_", " ") == title:
-        text = text[1:]
-
-    i = 0
-    while i < len(text):
-        line = text[i]
-
-        # Head lines
-        line = sub(r"^(=+)([^=]+)=+$", r"\g<1>\g<2>", line) # removes tailing '='
-        line = sub(r"^======", "#", line)
-        line = sub(r"^=====", "##", line)
-        line = sub(r"^====", "###", line)
-        line = sub(r"^===", "####", line)
-        line = sub(r"^==", "#####", line)
-        line = sub(r"^=", "######", line)
-
-        # Dates
-        line = sub(r"\[d:(\d{4}-\d{,2}-\d{,2})](.+)$", r"\g<2>\nDEADLINE: <\g<1> Day>", line)
-        line = sub(r"\[d:(\d{,2})\.(\d{,2})\.(\d{4})](.+)$", r"\g<4>\nDEADLINE: <\g<3>-\g<2>-\g<1> Day>", line) # central European date format!
-        line = sub(r"\[d:(\d{,2})/(\d{,2})/(\d{4})](.+)$", r"\g<4>\nDEADLINE: <\g<3>-\g<1>-\g<2> Day>", line) # American dates!
-        line = sub(r"\[d:(\d{,2}).(\d{,2}).\](.+)$",
-                r"\g<3>\nDEADLINE: <" + str(datetime.now().year) + r"-\g<2>-\g<1> Day>",
-                line)
-
-        # Links
-        for link in findall(r"\[\[:.+?\]\]", line):
-            target = link[2:-2]
-            # TODO relative to current file
+        if target.startswith("~"):
+            target = home_uri + target[1:]
+
+        if not target.startswith(("http://", "https://", "file://")):
+            # target = target.replace(" ", "_")
             target = target.replace(":", "/")
-            line = line.replace(link, f"[[{target}]]", 1)
-        
-        # not sure why they were excluding links starting with +
-        # for link in findall(r"\[\[[^+]+?\|?[^\]]+?\]\]", line):
-        for link in findall(r"\[\[.+?\|?[^\]]+?\]\]", line):
-            label, target = None, None
-            tokens = link[2:-2].split("|")
-
-            if len(tokens) > 2:
-                # probably not a link.
-                continue
-
-            if len(tokens) == 2:
-                target, label = tokens
-            else:
-                label = tokens[0]
-                target = tokens[0]
-
-            target = sub(r"^~", Path.home().as_uri(), target)
-
-            if not target.startswith("http://") \
-                    and not target.startswith("https://") \
-                    and not target.startswith("file://"):
-                # target = target.replace(" ", "_")
-                target = target.replace(":", "/")
-                target = target.replace("+", f"{title}/")
-
-            # Valid link formats:
-            # [[0Plots/Rich people|Rich people]]      [[target|label]]
-            # [Rich people](0Plots/Rich%20people)     [label](target.replace(" ", "%20"))
-            # [Rich people](<0Plots/Rich people>)     [label](<target>)
-            if not target == label:
-                if " " in target:
-                    line = line.replace(link, f"[{label}](<{target}>)", 1)
-                else:
-                    line = line.replace(link, f"[{label}]({target})", 1)
-            else:
-                line = line.replace(link, f"[[{target}]]", 1)
-        line = sub(r"(file://\S+)", r"[\g<1>](\g<1>)", line)
-
-        # Lists
-        line = sub(r"^(\s*)\[\*\]", r"\g<1>- [*]", line, count=1)
-        line = sub(r"^(\s*)\[x\]", r"\g<1>- [x]", line, count=1)
-        line = sub(r"^(\s*)\[>\]", r"\g<1>- [>]", line, count=1)
-        line = sub(r"^(\s*)\[ \]", r"\g<1>- [ ]", line, count=1)
-        # TODO indented list elements without dots or checkboxes
-
-        # @tags and +SubPageReferences
-        line = sub(r"^@(\S+)", r"#\g<1>", line)
-        line = sub(r"\s+@(\S+)", r"#\g<1>", line)
-        line = sub(r"\[\[\+(\S+?)\]\]", r"[[\g<1>]]", line)
-
-        # italics
-        line = sub(r"//(.+?)//", r"*\g<1>*", line)
-        
-        # rich text formatting?
-        line = sub(r"_\{(.+?)\}", r"<sub>\g<1></sub>", line)
-        line = sub(r"\^\{(.+?)\}", r"<sup>\g<1></sup>", line)
-        line = sub(r"~~(.+?)~~", r"~~\g<1>~~", line)
-        line = sub(r"(!?<=:)//([^:]+?)//", r"*\g<1>*", line)
-        line = sub(r"\*\*(.+?)\*\*", r"**\g<1>**", line)
-        line = sub(r"__(.+?)__", r"==\g<1>==", line)
-
-        # horizontal line
-        line = sub(r"--------------------", r"\n---", line)
-
-        # footnotes
-        line = sub(r"(?!<=\[)\[([0-9]{,4})\](?!=\])", r"[^\g<1>]", line)
-
-        # Images with parameters
-        line = sub(r"{{./(.+?)(?:\?.+)}}", rf"![[{title}/\g<1>]]", line)
-        line = sub(r"{{.\\(.+?)(?:\?.+)}}", rf"![[{title}/\g<1>]]", line)
-        
-        # Images without parameters
-        line = sub(r"{{./(.+?)}}", rf"![[{title}/\g<1>]]", line)
-        line = sub(r"{{.\\(.+?)}}", rf"![[{title}/\g<1>]]", line)
-        
-        # Old image lines
-        # line = sub(r"{{(.+?)}}", r"![[\g<1>]]", line)
-        # line = sub(r"{{(.+?)|(.+?)}}", r"![[\g<1>]]", line)
+            target = target.replace("+", subpage_prefix)
+
+        # Valid link formats:
+        # [[0Plots/Rich people|Rich people]]      [[target|label]]
+        # [Rich people](0Plots/Rich%20people)     [label](target.replace(" ", "%20"))
+        # [Rich people](<0Plots/Rich people>)     [label](<target>)
+        if not target == label:
+            if " " in target:
+                return f"[{label}](<{target}>)"
+            return f"[{label}]({target})"
+        return f"[[{target}]]"
 
-        # Code blocks
-        if line.startswith("{{{code:"):
-            langtag = findall('.+lang="(.+)" ', line)
+    # ignore duplicate title text
+    topline = _RE_TOPTITLE.search(lines[0]) if lines else None
+    if topline and topline.group(1).replace("_", " ") == title:
+        lines = lines[1:]
+    body = "".join(lines)
+
+    # Code blocks are cut out up front in one DOTALL pass so their contents
+    # stay verbatim; only the plain segments go through the line rules below.
+    segments = []
+    pos = 0
+    for m in _RE_CODEBLOCK.finditer(body):
+        segments.append((body[pos:m.start()], None))
+        segments.append((m.group("body"), m.group("meta")))
+        pos = m.end()
+    segments.append((body[pos:], None))
+
+    out = []
+    for segment, meta in segments:
+        if meta is not None:
+            langtag = _RE_CODE_LANG.search(meta)
             if langtag:
-                lang = langtag[0]
+                lang = langtag.group(1)
                 if lang == "python3":
                     lang = "python"
             else:
                 lang = ""
-            text[i] = f"```{lang}\n"
-            j = 0
-            subline = text[i + j]
-            while not subline.startswith("}}}"):
-                j += 1
-                subline = text[i + j]
-            text[i + j] = "```\n"
-            i += j + 1
+            out.append(f"```{lang}\n{segment}```\n")
             continue
 
-        text[i] = line
-        i += 1
+        out_append = out.append
+        for line in segment.splitlines(keepends=True):
+
+            # Head lines: '======' down to '=' map to '#'..'######'
+            if line.startswith("="):
+                line = _RE_HEADING.sub(
+                    lambda m: "#" * max(1, 7 - len(m.group(1))) + m.group(2), line
+                )
+
+            # Dates
+            if "[d:" in line:
+                line = _RE_DATE_ISO.sub(r"\g<2>\nDEADLINE: <\g<1> Day>", line)
+                line = _RE_DATE_EU.sub(r"\g<4>\nDEADLINE: <\g<3>-\g<2>-\g<1> Day>", line) # central European date format!
+                line = _RE_DATE_US.sub(r"\g<4>\nDEADLINE: <\g<3>-\g<1>-\g<2> Day>", line) # American dates!
+                line = _RE_DATE_SHORT.sub(
+                        r"\g<3>\nDEADLINE: <" + year + r"-\g<2>-\g<1> Day>",
+                        line)
+
+            # Links, rewritten in a single pass over the line
+            if "[[" in line:
+                line = _RE_LINK.sub(_link_repl, line)
+            if "file://" in line:
+                line = _RE_FILEURL.sub(r"[\g<1>](\g<1>)", line)
+
+            # Lists
+            if "[" in line:
+                stripped = line.lstrip()
+                mark = _CHECKBOX_MARKS.get(stripped[:3])
+                if mark is not None:
+                    line = line[:len(line) - len(stripped)] + mark + stripped[3:]
+                # TODO indented list elements without dots or checkboxes
+
+            # @tags and +SubPageReferences
+            if "@" in line:
+                if line.startswith("@") and len(line) > 1 and not line[1].isspace():
+                    line = "#" + line[1:]
+                line = _RE_TAG_INLINE.sub(r"#\g<1>", line)
+            if "[[+" in line:
+                line = line.replace("[[+", "[[")
+
+            # rich text formatting, all rules in one fused pass
+            line = rich_sub(_rich_repl, line)
+            if "//" in line:
+                line = _RE_ITALIC_COLON.sub(r"*\g<1>*", line)
+
+            # horizontal line
+            if "----" in line:
+                line = line.replace("--------------------", "\n---")
+
+            # footnotes
+            if "[" in line:
+                line = _RE_FOOTNOTE.sub(r"[^\g<1>]", line)
+
+            # Images
+            if "{{" in line:
+                # with parameters
+                line = _RE_IMG_PARAM_FWD.sub(img_repl, line)
+                line = _RE_IMG_PARAM_BACK.sub(img_repl, line)
+                # without parameters
+                line = _RE_IMG_FWD.sub(img_repl, line)
+                line = _RE_IMG_BACK.sub(img_repl, line)
+        
+            # Old image lines
+            # line = sub(r"{{(.+?)}}", r"![[\g<1>]]", line)
+            # line = sub(r"{{(.+?)|(.+?)}}", r"![[\g<1>]]", line)
+
+            out_append(line)
 
     # TODO more features
-    return text
+    return "".join(out)
+
+
+def _copy_one(task):
+    """Worker for the copy pool: copy file contents and carry over the
+    timestamps, skipping copy2's full metadata round trip."""
+    src, dst = task
+    st = os.stat(src)
+    copyfile(src, dst)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def _convert_one(task):
+    """Worker for the bulk-conversion pool: translate a single note file."""
+    old_fp, new_fp = task
+    # read/decode and encode/write in one call each; the default 8 KiB
+    # buffer is tiny for bulk small-file work
+    with open(old_fp, 'rb', buffering=131072) as _f:
+        # normalize CRLF like text mode did, so $-anchored rules still match
+        content = _f.read().decode("utf-8").replace("\r\n", "\n")
+    content = translate(content, old_fp, new_fp)
+    with open(new_fp, 'wb', buffering=131072) as _o:
+        _o.write(content.encode("utf-8"))
+
+
+def _walk(root):
+    """os.walk lookalike built on os.scandir; the DirEntry objects carry the
+    file-type information from the directory listing, so no per-entry stat
+    call is needed."""
+    dirs = []
+    files = []
+    for entry in os.scandir(root):
+        if entry.is_dir(follow_symlinks=False):
+            dirs.append(entry.name)
+        else:
+            files.append(entry.name)
+    yield root, dirs, files
+    for name in dirs:
+        yield from _walk(os.path.join(root, name))
 
 
 if __name__ == "__main__":
     if len(sys.argv) <= 1:
-        ls = sys.stdin.readlines()
-        if compatible(lines=ls):
-            sys.stdout.writelines(translate(text=ls))
+        data = sys.stdin.read()
+        if compatible(lines=data.splitlines(keepends=True)):
+            sys.stdout.write(translate(text=data))
         else:
             sys.stderr.writelines(["FATAL: Incompatible file.\n"])
             sys.exit(1)
@@ -201,34 +305,53 @@ if __name__ == "__main__":
         _path = os.path.normpath(sys.argv[1])
         _newpath = os.path.normpath(sys.argv[2])
 
-        os.makedirs(_newpath, exist_ok=True)
+        _made = set()
+
+        def _ensure_dir(d):
+            """makedirs with a cache so no directory is created twice and
+            already-known ancestors are not re-checked."""
+            if d in _made:
+                return
+            os.makedirs(d, exist_ok=True)
+            _made.add(d)
+            parent = os.path.dirname(d)
+            while parent and parent not in _made:
+                _made.add(parent)
+                parent = os.path.dirname(parent)
+
+        _ensure_dir(_newpath)
 
-        for olddir, folders, files in os.walk(_path):
+        _translations = []
+        _copies = []
+
+        for olddir, folders, files in _walk(_path):
 
             if olddir != _path:
                 relpath = os.path.relpath(olddir, _path)
             else:
                 relpath = ""
+            # the same for every entry in this directory
+            new_relpath = relpath.replace("_", " ")
 
             for folder in folders:
-                os.makedirs(os.path.join(
+                _ensure_dir(os.path.join(
                     _newpath,
-                    relpath.replace("_", " "),
+                    new_relpath,
                     folder.replace("_", " "),
-                ), exist_ok=True)
+                ))
 
             for file in files:
 
-                # temp google drive workaround
-                if os.path.splitext(file)[1].lower() in [".gform", ".gsheet"]:
+                ext = os.path.splitext(file)[1].lower()
+                if ext in SKIP_EXTS:
                     continue
 
                 old_fp = os.path.join(olddir, file)
 
-                if os.path.splitext(file)[1].lower() == ".txt":
+                if ext == ".txt":
                     new_folder = os.path.join(
                         _newpath,
-                        relpath.replace("_", " "),
+                        new_relpath,
                     )
                     new_fileid = os.path.splitext(file.replace("_", " "))[0]
                     new_filename = new_fileid + ".md"
@@ -244,17 +367,27 @@ if __name__ == "__main__":
                             new_filename
                         )
 
-                    print(f"Translating {old_fp} to {new_fp}")
-                    with open(old_fp, 'r', encoding="utf-8") as _f:
-                        lines = _f.readlines()
-                    lines = translate(lines, old_fp, new_fp)
-                    with open(new_fp, 'w', encoding="utf-8") as _o:
-                        _o.writelines(lines)
+                    if compatible(path=old_fp):
+                        print(f"Translating {old_fp} to {new_fp}")
+                        _translations.append((old_fp, new_fp))
+                    else:
+                        print(f"WARN: no conversion of {old_fp} but copy to {new_fp}")
+                        _copies.append((old_fp, new_fp))
                 else:
                     new_fp = os.path.join(
                         _newpath,
-                        relpath.replace("_", " "),
+                        new_relpath,
                         file,
                     )
                     print(f"Copying {old_fp} to {new_fp}")
-                    copy2(old_fp, new_fp)
+                    _copies.append((old_fp, new_fp))
+
+        # copies are I/O bound, so threads are enough; translation is CPU
+        # bound, so it goes to worker processes with a chunksize that keeps
+        # the per-task pickling overhead small
+        if _copies:
+            with ThreadPoolExecutor(max_workers=min(32, len(_copies))) as _ex:
+                list(_ex.map(_copy_one, _copies))
+        if _translations:
+            with ProcessPoolExecutor() as _ex:
+                list(_ex.map(_convert_one, _translations, chunksize=32))